@@ -3,13 +3,77 @@ Analyzer Module
 Performs statistical analysis on hydrological data
 """
 
+import hashlib
 import pandas as pd
 import numpy as np
-from scipy import stats
-import json
+from scipy import special
+import orjson
 from pathlib import Path
 
 
+# Part of the analysis cache key; bump whenever the analysis code or the
+# results layout changes so cached results from older code are not reused
+CACHE_VERSION = 2
+
+
+def _compute_all(times, flows):
+    """
+    Numeric core of the analysis in a fixed number of NumPy passes
+    
+    Args:
+        times: int64 nanosecond timestamps, sorted ascending
+        flows: float32 discharge aligned with times (NaN where missing)
+    
+    Returns:
+        tuple: (n, mean, M2, quantiles, Sxx, Sxy, anomaly_idx, rank)
+            n: number of valid readings
+            mean, M2: discharge mean and sum of squared deviations
+            quantiles: min, Q25, Q50, Q75, Q90 and max discharge
+            Sxx, Sxy: centered time sums for the trend regression
+            anomaly_idx: positions of the IQR outliers in flows
+            rank: position of the latest reading among the sorted values
+    """
+    valid = ~np.isnan(flows)
+    sorted_flow = np.sort(flows[valid])
+    n = sorted_flow.size
+    quantiles = np.full(6, np.nan)
+    
+    if n == 0:
+        return 0, np.nan, 0.0, quantiles, 0.0, 0.0, np.array([], dtype=np.intp), 0
+    
+    # Centered sums in float64; time in seconds since the first reading
+    x = (times[valid] - times[0]) / 1e9
+    y = flows[valid].astype(np.float64)
+    mean = y.mean()
+    dx = x - x.mean()
+    dy = y - mean
+    M2 = dy @ dy
+    Sxx = dx @ dx
+    Sxy = dx @ dy
+    
+    quantiles[0] = sorted_flow[0]
+    quantiles[1:5] = np.percentile(sorted_flow, [25, 50, 75, 90])
+    quantiles[5] = sorted_flow[-1]
+    
+    # IQR outliers (NaN compares False, so missing readings are never flagged)
+    iqr = quantiles[3] - quantiles[1]
+    lower = quantiles[1] - 1.5 * iqr
+    upper = quantiles[3] + 1.5 * iqr
+    anomaly_idx = np.flatnonzero((flows < lower) | (flows > upper))
+    
+    # Rank of the latest reading via binary search over the sorted values
+    rank = 0 if np.isnan(flows[-1]) else np.searchsorted(sorted_flow, flows[-1], side='right')
+    
+    return n, mean, M2, quantiles, Sxx, Sxy, anomaly_idx, rank
+
+
+def _json_default(obj):
+    """Serialize pandas timestamps for orjson"""
+    if isinstance(obj, pd.Timestamp):
+        return obj.strftime('%Y-%m-%d %H:%M:%S')
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
 class StreamflowAnalyzer:
     """Analyze streamflow data and compute statistics"""
     
@@ -18,6 +82,8 @@ class StreamflowAnalyzer:
         self.config = config
         self.results_dir = Path('results')
         self.results_dir.mkdir(exist_ok=True)
+        # Git-ignored, so the cache never ends up in the committed results
+        self.cache_file = Path('cache') / 'analysis_cache.json'
     
     def analyze(self, df):
         """
@@ -31,33 +97,55 @@ class StreamflowAnalyzer:
         """
         results = {}
         
-        # Basic statistics
-        results['mean_flow'] = df['discharge_cfs'].mean()
-        results['median_flow'] = df['discharge_cfs'].median()
-        results['std_flow'] = df['discharge_cfs'].std()
-        results['min_flow'] = df['discharge_cfs'].min()
-        results['max_flow'] = df['discharge_cfs'].max()
+        # Sort chronologically once; the helpers below rely on this order
+        if not df['dateTime'].is_monotonic_increasing:
+            df = df.sort_values('dateTime', kind='mergesort', ignore_index=True)
+        
+        # Work on the raw discharge array so each statistic doesn't
+        # re-scan the column through pandas. Discharge is kept as float32;
+        # the reductions accumulate in float64 and results are reported at
+        # float32 precision.
+        arr = df['discharge_cfs'].to_numpy(dtype=np.float32, copy=False)
+        times = df['dateTime'].to_numpy().astype('datetime64[ns]', copy=False).view(np.int64)
+        
+        # Skip the analysis entirely when the input is unchanged since the last run
+        key = self._data_key(df, arr, times)
+        cached = self._load_cached(key)
+        if cached is not None:
+            cached['analysis_date'] = pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')
+            return cached
+        
+        # All reductions over the sorted arrays in one call
+        n, mean_flow, M2, quantiles, Sxx, Sxy, anomaly_idx, rank = _compute_all(times, arr)
+        min_flow, q25, q50, q75, q90, max_flow = quantiles.astype(np.float32)
+        
+        # Basic statistics (sample std, ddof=1, to match pandas)
+        results['mean_flow'] = np.float32(mean_flow)
+        results['median_flow'] = q50
+        results['std_flow'] = np.float32(np.sqrt(M2 / (n - 1)) if n > 1 else np.nan)
+        results['min_flow'] = min_flow
+        results['max_flow'] = max_flow
         results['total_records'] = len(df)
         
         # Percentiles
-        results['percentile_25'] = df['discharge_cfs'].quantile(0.25)
-        results['percentile_75'] = df['discharge_cfs'].quantile(0.75)
-        results['percentile_90'] = df['discharge_cfs'].quantile(0.90)
+        results['percentile_25'] = q25
+        results['percentile_75'] = q75
+        results['percentile_90'] = q90
         
         # Trend analysis
-        results['trend'] = self._analyze_trend(df)
+        results['trend'] = self._analyze_trend(n, M2, Sxx, Sxy)
         results['trend_slope'] = results['trend']['slope']
         results['trend_direction'] = results['trend']['direction']
         
         # Anomaly detection
-        results['anomalies'] = self._detect_anomalies(df)
+        results['anomalies'] = self._detect_anomalies(df, arr, anomaly_idx)
         results['anomaly_count'] = len(results['anomalies'])
         
         # Flow classification
-        results['flow_status'] = self._classify_flow(df)
+        results['flow_status'] = self._classify_flow(arr[-1], rank, n)
         
         # Recent change
-        results['recent_change'] = self._calculate_recent_change(df)
+        results['recent_change'] = self._calculate_recent_change(arr)
         
         # Summary message
         results['summary'] = self._generate_summary(results)
@@ -66,23 +154,83 @@ class StreamflowAnalyzer:
         results['analysis_date'] = pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')
         results['sites_analyzed'] = df['site_code'].unique().tolist()
         
+        # orjson writes NaN as null, so only cache results that round-trip intact
+        if self._is_finite(results):
+            self.cache_file.parent.mkdir(exist_ok=True)
+            self.save_results({'key': key, 'results': results}, self.cache_file)
+        
         return results
     
-    def _analyze_trend(self, df):
-        """Analyze trend using linear regression"""
-        df_sorted = df.sort_values('dateTime').copy()
-        df_sorted['time_numeric'] = (df_sorted['dateTime'] - df_sorted['dateTime'].min()).dt.total_seconds()
+    def _data_key(self, df, arr, times):
+        """Hash the raw discharge/time buffers and site codes into a cache key"""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(str(CACHE_VERSION).encode())
+        h.update(arr.tobytes())
+        h.update(times.tobytes())
+        h.update('\0'.join(map(str, df['site_code'].unique())).encode())
+        return h.hexdigest()
+    
+    def _load_cached(self, key):
+        """Return the cached results for key, or None if missing or stale"""
+        try:
+            with open(self.cache_file, 'rb') as f:
+                cached = orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError):
+            return None
         
-        # Remove NaN values
-        valid_data = df_sorted[['time_numeric', 'discharge_cfs']].dropna()
+        if cached.get('key') != key:
+            return None
         
-        if len(valid_data) < 3:
+        # Restore the types a fresh run returns: float32 flow values and
+        # pd.Timestamp anomaly times (JSON only gives back floats and strings)
+        results = cached['results']
+        for name in ('mean_flow', 'median_flow', 'std_flow', 'min_flow', 'max_flow',
+                     'percentile_25', 'percentile_75', 'percentile_90'):
+            results[name] = np.float32(results[name])
+        results['flow_status']['latest_flow'] = np.float32(results['flow_status']['latest_flow'])
+        results['recent_change'] = {
+            k: np.float32(v) if isinstance(v, float) else v
+            for k, v in results['recent_change'].items()
+        }
+        for anomaly in results['anomalies']:
+            anomaly['dateTime'] = pd.Timestamp(anomaly['dateTime'])
+            anomaly['discharge_cfs'] = np.float32(anomaly['discharge_cfs'])
+        return results
+    
+    def _is_finite(self, results):
+        """Check that every numeric result is finite"""
+        trend = results['trend']
+        values = [
+            results['mean_flow'], results['median_flow'], results['std_flow'],
+            results['min_flow'], results['max_flow'],
+            results['percentile_25'], results['percentile_75'], results['percentile_90'],
+            trend['slope'], trend['p_value'], trend.get('r_squared', 0.0),
+            results['flow_status']['latest_flow'], results['flow_status']['percentile'],
+            results['recent_change']['change_cfs'], results['recent_change']['change_pct']
+        ]
+        return bool(np.all(np.isfinite(values)))
+    
+    def _analyze_trend(self, n, Syy, Sxx, Sxy):
+        """Analyze trend using linear regression from the centered sums"""
+        if n < 3 or Sxx == 0:
             return {'slope': 0, 'direction': 'insufficient data', 'p_value': 1.0}
         
-        slope, intercept, r_value, p_value, std_err = stats.linregress(
-            valid_data['time_numeric'], 
-            valid_data['discharge_cfs']
-        )
+        slope = Sxy / Sxx
+        
+        if Syy == 0:
+            # Constant flow: no correlation
+            r_squared = 0.0
+            p_value = 1.0
+        else:
+            r_squared = (Sxy * Sxy) / (Sxx * Syy)
+            resid = max(Syy - slope * Sxy, 0.0)
+            if resid == 0:
+                # Exact straight-line fit: t is infinite
+                p_value = 0.0
+            else:
+                t = slope * np.sqrt((n - 2) * Sxx / resid)
+                # Two-sided p-value from Student's t distribution
+                p_value = 2 * special.stdtr(n - 2, -abs(t))
         
         # Determine trend direction
         if p_value > 0.05:
@@ -95,32 +243,24 @@ class StreamflowAnalyzer:
         return {
             'slope': float(slope),
             'direction': direction,
-            'r_squared': float(r_value ** 2),
+            'r_squared': float(r_squared),
             'p_value': float(p_value)
         }
     
-    def _detect_anomalies(self, df):
-        """Detect anomalous values using IQR method"""
-        Q1 = df['discharge_cfs'].quantile(0.25)
-        Q3 = df['discharge_cfs'].quantile(0.75)
-        IQR = Q3 - Q1
-        
-        lower_bound = Q1 - 1.5 * IQR
-        upper_bound = Q3 + 1.5 * IQR
-        
-        anomalies = df[
-            (df['discharge_cfs'] < lower_bound) | 
-            (df['discharge_cfs'] > upper_bound)
-        ].copy()
+    def _detect_anomalies(self, df, arr, idx):
+        """Build records for the IQR outliers found by _compute_all"""
+        times = df['dateTime'].iloc[idx]
+        flows = arr[idx]
+        names = df['site_name'].to_numpy()[idx]
         
-        return anomalies[['dateTime', 'discharge_cfs', 'site_name']].to_dict('records')
+        return [
+            {'dateTime': t, 'discharge_cfs': q, 'site_name': name}
+            for t, q, name in zip(times, flows, names)
+        ]
     
-    def _classify_flow(self, df):
-        """Classify current flow conditions"""
-        latest_flow = df.sort_values('dateTime').iloc[-1]['discharge_cfs']
-        mean_flow = df['discharge_cfs'].mean()
-        
-        percentile = (df['discharge_cfs'] <= latest_flow).mean() * 100
+    def _classify_flow(self, latest_flow, rank, n_valid):
+        """Classify current flow conditions from the latest reading's rank"""
+        percentile = 100.0 * rank / n_valid if n_valid else 0.0
         
         if percentile >= 90:
             status = 'High Flow'
@@ -135,26 +275,24 @@ class StreamflowAnalyzer:
         
         return {
             'status': status,
-            'latest_flow': float(latest_flow),
+            'latest_flow': np.float32(latest_flow),
             'percentile': float(percentile)
         }
     
-    def _calculate_recent_change(self, df):
-        """Calculate recent change in flow"""
-        df_sorted = df.sort_values('dateTime')
-        
-        if len(df_sorted) < 2:
+    def _calculate_recent_change(self, arr):
+        """Calculate recent change in flow from the time-sorted discharge array"""
+        if arr.size < 2:
             return {'change_pct': 0, 'change_cfs': 0}
         
-        latest = df_sorted.iloc[-1]['discharge_cfs']
-        previous = df_sorted.iloc[-24]['discharge_cfs'] if len(df_sorted) >= 24 else df_sorted.iloc[0]['discharge_cfs']
+        latest = arr[-1]
+        previous = arr[-24] if arr.size >= 24 else arr[0]
         
         change_cfs = latest - previous
         change_pct = (change_cfs / previous * 100) if previous != 0 else 0
         
         return {
-            'change_cfs': float(change_cfs),
-            'change_pct': float(change_pct)
+            'change_cfs': np.float32(change_cfs),
+            'change_pct': np.float32(change_pct)
         }
     
     def _generate_summary(self, results):
@@ -172,23 +310,10 @@ class StreamflowAnalyzer:
     
     def save_results(self, results, filepath):
         """Save analysis results to JSON file"""
-        # Convert any numpy types to native Python types
-        results_serializable = self._make_serializable(results)
-        
-        with open(filepath, 'w') as f:
-            json.dump(results_serializable, f, indent=2)
-    
-    def _make_serializable(self, obj):
-        """Convert numpy/pandas types to native Python types"""
-        if isinstance(obj, dict):
-            return {k: self._make_serializable(v) for k, v in obj.items()}
-        elif isinstance(obj, list):
-            return [self._make_serializable(item) for item in obj]
-        elif isinstance(obj, (np.integer, np.floating)):
-            return float(obj)
-        elif isinstance(obj, np.ndarray):
-            return obj.tolist()
-        elif isinstance(obj, pd.Timestamp):
-            return obj.strftime('%Y-%m-%d %H:%M:%S')
-        else:
-            return obj
+        # orjson emits numpy scalars/arrays natively; timestamps go through _json_default
+        with open(filepath, 'wb') as f:
+            f.write(orjson.dumps(
+                results,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY,
+                default=_json_default
+            ))
@@ -4,10 +4,17 @@ Fetches hydrological data from USGS Water Services API
 """
 
 import requests
+import requests_cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-import json
+import orjson
 
 
 class USGSDataFetcher:
@@ -22,6 +29,20 @@ class USGSDataFetcher:
         self.parameter = config.get('parameter', '00060')  # 00060 = Discharge (cfs)
         self.data_dir = Path('data')
         self.data_dir.mkdir(exist_ok=True)
+        self.cache_dir = Path('cache')
+        
+        # Reuse one keep-alive connection pool for every request to USGS
+        self.retry = Retry(total=3, backoff_factor=0.3, status_forcelist=(500, 502, 503, 504))
+        pool_size = max(1, len(self.site_codes))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=self.retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        
+        # Decoded payloads per (site, start, end) for the lifetime of this fetcher
+        self._response_cache = {}
+        
+        # On-disk site metadata cache, opened on first use by get_site_info
+        self.info_session = None
     
     def fetch_latest_data(self, days=7):
         """
@@ -36,23 +57,36 @@ class USGSDataFetcher:
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
         
-        all_data = []
+        site_data = {}
         
-        for site in self.site_codes:
-            try:
+        # Requests are I/O-bound, so fetch the sites concurrently
+        with ThreadPoolExecutor(max_workers=max(1, min(16, len(self.site_codes)))) as executor:
+            futures = {}
+            for site in self.site_codes:
                 print(f"  Fetching data for site {site}...")
-                data = self._fetch_site_data(site, start_date, end_date)
-                if data is not None:
-                    all_data.append(data)
-            except Exception as e:
-                print(f"  ⚠ Error fetching site {site}: {str(e)}")
-                continue
+                futures[executor.submit(self._fetch_site_data, site, start_date, end_date)] = site
+            
+            for future in as_completed(futures):
+                site = futures[future]
+                try:
+                    data = future.result()
+                    if data is not None:
+                        site_data[site] = data
+                except Exception as e:
+                    print(f"  ⚠ Error fetching site {site}: {str(e)}")
+        
+        # Keep the configured site order regardless of completion order
+        all_data = [site_data[site] for site in self.site_codes if site in site_data]
         
         if not all_data:
             return None
         
-        # Combine all site data
-        df = pd.concat(all_data, ignore_index=True)
+        # Combine all site data (a single site needs no concatenation)
+        df = all_data[0] if len(all_data) == 1 else pd.concat(all_data, ignore_index=True)
+        
+        # Sort chronologically once so analysis and plotting can skip their own sorts
+        if not df['dateTime'].is_monotonic_increasing:
+            df = df.sort_values('dateTime', kind='mergesort', ignore_index=True)
         
         # Save raw data
         self._save_data(df)
@@ -61,19 +95,11 @@ class USGSDataFetcher:
     
     def _fetch_site_data(self, site_code, start_date, end_date):
         """Fetch data for a single site"""
-        params = {
-            'format': 'json',
-            'sites': site_code,
-            'parameterCd': self.parameter,
-            'startDT': start_date.strftime('%Y-%m-%d'),
-            'endDT': end_date.strftime('%Y-%m-%d'),
-            'siteStatus': 'all'
-        }
-        
-        response = requests.get(self.BASE_URL, params=params, timeout=30)
-        response.raise_for_status()
-        
-        data = response.json()
+        data = self._fetch_site_data_cached(
+            site_code,
+            start_date.strftime('%Y-%m-%d'),
+            end_date.strftime('%Y-%m-%d')
+        )
         
         # Parse JSON response
         time_series = data['value']['timeSeries']
@@ -83,27 +109,74 @@ class USGSDataFetcher:
         values = time_series[0]['values'][0]['value']
         site_name = time_series[0]['sourceInfo']['siteName']
         
+        # Pull out the columns in one pass instead of building a frame of dicts
+        date_times = [v['dateTime'] for v in values]
+        discharge = [v['value'] for v in values]
+        
         # Convert to DataFrame
-        df = pd.DataFrame(values)
         # Normalize timestamps to naive UTC to avoid timezone arithmetic issues (e.g., DST transitions)
-        df['dateTime'] = pd.to_datetime(df['dateTime'], utc=True).dt.tz_localize(None)
-        df['value'] = pd.to_numeric(df['value'], errors='coerce')
-        df['site_code'] = site_code
-        df['site_name'] = site_name
-        df.rename(columns={'value': 'discharge_cfs'}, inplace=True)
+        df = pd.DataFrame({
+            'dateTime': pd.to_datetime(date_times, utc=True, format='ISO8601').tz_localize(None),
+            'site_code': site_code,
+            'site_name': site_name,
+            # Discharge carries only a few significant digits, so float32 is enough
+            # and halves the memory every downstream reduction has to stream
+            'discharge_cfs': pd.to_numeric(discharge, errors='coerce').astype(np.float32)
+        })
+        
+        return df
+    
+    def _fetch_site_data_cached(self, site_code, start_iso, end_iso):
+        """
+        Request and decode the JSON payload for a site, memoized per date window
+        
+        The window only has day resolution, so a repeated fetch from the same
+        fetcher on the same day returns the first payload and will not include
+        readings USGS has published since (they arrive every ~15 minutes).
+        Create a new USGSDataFetcher to get fresh data.
+        """
+        key = (site_code, start_iso, end_iso)
+        if key in self._response_cache:
+            return self._response_cache[key]
+        
+        params = {
+            'format': 'json',
+            'sites': site_code,
+            'parameterCd': self.parameter,
+            'startDT': start_iso,
+            'endDT': end_iso,
+            'siteStatus': 'all'
+        }
         
-        return df[['dateTime', 'site_code', 'site_name', 'discharge_cfs']]
+        response = self.session.get(self.BASE_URL, params=params, timeout=30)
+        response.raise_for_status()
+        
+        data = orjson.loads(response.content)
+        self._response_cache[key] = data
+        return data
     
     def _save_data(self, df):
         """Save data to local storage"""
         timestamp = datetime.now().strftime('%Y%m%d')
         filename = self.data_dir / f"usgs_data_{timestamp}.csv"
-        df.to_csv(filename, index=False)
+        # Arrow's C++ CSV writer avoids pandas' per-row string formatting
+        pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), filename)
         print(f"  Data saved to {filename}")
     
     def get_site_info(self, site_code):
         """Get information about a USGS site"""
         url = f"https://waterservices.usgs.gov/nwis/site/?format=rdb&sites={site_code}&siteOutput=expanded"
-        response = requests.get(url, timeout=30)
+        
+        if self.info_session is None:
+            # Site metadata rarely changes, so keep it in an on-disk cache
+            self.cache_dir.mkdir(exist_ok=True)
+            self.info_session = requests_cache.CachedSession(
+                str(self.cache_dir / 'usgs_site_info'),
+                expire_after=timedelta(days=7)
+            )
+            # Separate adapter so closing one session doesn't close the other's pool
+            self.info_session.mount('https://', HTTPAdapter(max_retries=self.retry))
+        
+        response = self.info_session.get(url, timeout=30)
         response.raise_for_status()
         return response.text
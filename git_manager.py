@@ -3,6 +3,7 @@ Git Manager Module
 Handles automatic Git commits and pushes
 """
 
+import os
 import subprocess
 from pathlib import Path
 from datetime import datetime
@@ -27,17 +28,15 @@ class GitManager:
             bool: True if successful, False otherwise
         """
         try:
-            # Check if there are changes to commit
-            if not self._has_changes():
-                print("  No changes to commit")
-                return False
-            
             # Add all changes
             self._run_git_command(['add', '.'])
             print("  ✓ Changes staged")
             
-            # Commit
-            self._run_git_command(['commit', '-m', commit_message])
+            # Commit; this also picks up changes left staged by an earlier
+            # failed run and doubles as the "no changes" check
+            if not self._commit(commit_message):
+                print("  No changes to commit")
+                return False
             print("  ✓ Changes committed")
             
             # Push to remote
@@ -54,13 +53,28 @@ class GitManager:
             print(f"  ✗ Unexpected error: {e}")
             return False
     
-    def _has_changes(self):
-        """Check if there are uncommitted changes"""
-        try:
-            result = self._run_git_command(['status', '--porcelain'], capture_output=True)
-            return len(result.stdout.strip()) > 0
-        except:
+    def _commit(self, commit_message):
+        """
+        Commit the index without a separate status check
+        
+        Returns:
+            bool: True if a commit was made, False if there was nothing to commit
+        """
+        # Force the C locale so the "nothing to commit" message is not translated
+        result = subprocess.run(
+            ['git', 'commit', '-m', commit_message],
+            cwd=self.repo_path,
+            capture_output=True,
+            text=True,
+            env={**os.environ, 'LC_ALL': 'C'}
+        )
+        if result.returncode == 1 and 'nothing to commit' in result.stdout:
             return False
+        if result.returncode != 0:
+            raise subprocess.CalledProcessError(
+                result.returncode, result.args, result.stdout, result.stderr
+            )
+        return True
     
     def _run_git_command(self, args, capture_output=False):
         """
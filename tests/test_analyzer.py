@@ -0,0 +1,96 @@
+"""
+Tests for the analyzer module
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analyzer import StreamflowAnalyzer
+
+
+def make_frame(values):
+    """Hourly single-site frame with the given discharge values"""
+    return pd.DataFrame({
+        'dateTime': pd.date_range('2026-01-01', periods=len(values), freq='h'),
+        'site_code': '01646500',
+        'site_name': 'POTOMAC RIVER',
+        'discharge_cfs': np.array(values, dtype=np.float32)
+    })
+
+
+@pytest.fixture
+def analyzer(tmp_path, monkeypatch):
+    """Analyzer writing its results/cache under a temporary directory"""
+    monkeypatch.chdir(tmp_path)
+    return StreamflowAnalyzer({})
+
+
+@pytest.mark.parametrize('values', [[5, 6, 7], [1, np.nan, 3, 4, 5]])
+def test_trend_perfectly_linear(analyzer, values):
+    results = analyzer.analyze(make_frame(values))
+    
+    assert results['trend']['direction'] == 'increasing'
+    assert results['trend']['p_value'] == 0.0
+    assert results['trend']['r_squared'] == pytest.approx(1.0)
+
+
+def assert_same_types(fresh, cached, path='results'):
+    """Recursively check that two results trees hold the same types"""
+    assert type(fresh) is type(cached), f"{path}: {type(fresh)} != {type(cached)}"
+    if isinstance(fresh, dict):
+        assert fresh.keys() == cached.keys(), path
+        for key in fresh:
+            assert_same_types(fresh[key], cached[key], f"{path}.{key}")
+    elif isinstance(fresh, list):
+        assert len(fresh) == len(cached), path
+        for i, (a, b) in enumerate(zip(fresh, cached)):
+            assert_same_types(a, b, f"{path}[{i}]")
+
+
+def outlier_values():
+    """Readings with a couple of IQR outliers so anomalies are populated"""
+    values = list(np.linspace(100, 130, 48))
+    values[10] = 900.5
+    values[30] = 1.5
+    return values
+
+
+def test_cache_hit_returns_fresh_results(analyzer, monkeypatch):
+    import analyzer as analyzer_module
+    
+    fresh = analyzer.analyze(make_frame(outlier_values()))
+    assert fresh['anomaly_count'] == 2
+    assert analyzer.cache_file.exists()
+    
+    # A hit must not recompute anything
+    def fail(*args):
+        raise AssertionError('analysis recomputed on a cache hit')
+    monkeypatch.setattr(analyzer_module, '_compute_all', fail)
+    cached = analyzer.analyze(make_frame(outlier_values()))
+    
+    assert_same_types(fresh, cached)
+    fresh.pop('analysis_date')
+    cached.pop('analysis_date')
+    assert cached == fresh
+
+
+def test_cache_miss_on_changed_data(analyzer):
+    values = outlier_values()
+    first = analyzer.analyze(make_frame(values))
+    
+    values[-1] += 50
+    second = analyzer.analyze(make_frame(values))
+    
+    assert second['flow_status']['latest_flow'] == first['flow_status']['latest_flow'] + 50
+
+
+def test_nan_results_not_cached(analyzer):
+    frame = make_frame([np.nan, np.nan, np.nan])
+    
+    for _ in range(2):
+        results = analyzer.analyze(frame)
+        assert np.isnan(results['mean_flow'])
+        assert f"{results['mean_flow']:.2f}" == 'nan'
+    
+    assert not analyzer.cache_file.exists()
@@ -3,12 +3,18 @@ Visualizer Module
 Creates plots and visualizations for hydrological data
 """
 
+import matplotlib
+matplotlib.use('Agg')  # Headless rendering; must be selected before pyplot is imported
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import pandas as pd
 from pathlib import Path
 import seaborn as sns
 
+# Simplify long line paths and render them in chunks
+plt.rcParams['path.simplify'] = True
+plt.rcParams['agg.path.chunksize'] = 10000
+
 
 class DataVisualizer:
     """Create visualizations for streamflow data"""
@@ -22,6 +28,8 @@ class DataVisualizer:
         # Set style
         plt.style.use('seaborn-v0_8-darkgrid')
         sns.set_palette("husl")
+        
+        self.date_formatter = mdates.DateFormatter('%m/%d %H:%M')
     
     def create_plots(self, df, results):
         """
@@ -36,28 +44,38 @@ class DataVisualizer:
         """
         plots = []
         
-        # Time series plot
-        plots.append(self._plot_time_series(df, results))
-        
-        # Distribution plot
-        plots.append(self._plot_distribution(df))
-        
-        # Statistics summary plot
-        plots.append(self._plot_statistics(results))
+        # One figure is reused (cleared) for every plot
+        fig = plt.figure(figsize=(12, 6))
+        
+        try:
+            # Time series plot
+            plots.append(self._plot_time_series(fig, df, results))
+            
+            # Distribution plot
+            plots.append(self._plot_distribution(fig, df))
+            
+            # Statistics summary plot
+            plots.append(self._plot_statistics(fig, results))
+        finally:
+            plt.close(fig)
         
         return plots
     
-    def _plot_time_series(self, df, results):
+    def _plot_time_series(self, fig, df, results):
         """Create time series plot of streamflow"""
-        fig, ax = plt.subplots(figsize=(12, 6))
+        fig.clear()
+        fig.set_size_inches(12, 6)
+        ax = fig.add_subplot()
         
-        df_sorted = df.sort_values('dateTime')
+        # analyze() output is usually already in order; only sort when needed
+        df_sorted = df
+        if not df['dateTime'].is_monotonic_increasing:
+            df_sorted = df.sort_values('dateTime', kind='mergesort')
         
-        # Plot data by site
-        for site in df['site_code'].unique():
-            site_data = df_sorted[df_sorted['site_code'] == site]
+        # Plot data by site (one partitioning pass instead of a filter per site)
+        for site, site_data in df_sorted.groupby('site_code', sort=False):
             ax.plot(site_data['dateTime'], site_data['discharge_cfs'], 
-                   label=site_data['site_name'].iloc[0], marker='o', markersize=3, alpha=0.7)
+                   label=site_data['site_name'].iat[0], marker='o', markersize=3, alpha=0.7)
         
         # Add mean line
         ax.axhline(y=results['mean_flow'], color='red', linestyle='--', 
@@ -71,8 +89,8 @@ class DataVisualizer:
         ax.grid(True, alpha=0.3)
         
         # Format x-axis
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%m/%d %H:%M'))
-        plt.xticks(rotation=45)
+        ax.xaxis.set_major_formatter(self.date_formatter)
+        ax.tick_params(axis='x', labelrotation=45)
         
         # Add status text
         status_text = f"Status: {results['flow_status']['status']}\nTrend: {results['trend_direction']}"
@@ -80,19 +98,20 @@ class DataVisualizer:
                 fontsize=10, verticalalignment='top',
                 bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
         
-        plt.tight_layout()
+        fig.tight_layout()
         
         # Save
         timestamp = pd.Timestamp.now().strftime('%Y%m%d')
         filepath = self.plots_dir / f'timeseries_{timestamp}.png'
-        plt.savefig(filepath, dpi=150, bbox_inches='tight')
-        plt.close()
+        fig.savefig(filepath, dpi=150, bbox_inches='tight')
         
         return filepath
     
-    def _plot_distribution(self, df):
+    def _plot_distribution(self, fig, df):
         """Create distribution plot"""
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 5))
+        fig.clear()
+        fig.set_size_inches(14, 5)
+        ax1, ax2 = fig.subplots(1, 2)
         
         # Histogram
         ax1.hist(df['discharge_cfs'].dropna(), bins=30, edgecolor='black', alpha=0.7)
@@ -107,19 +126,20 @@ class DataVisualizer:
         ax2.set_title('Streamflow Box Plot', fontsize=12, fontweight='bold')
         ax2.grid(True, alpha=0.3)
         
-        plt.tight_layout()
+        fig.tight_layout()
         
         # Save
         timestamp = pd.Timestamp.now().strftime('%Y%m%d')
         filepath = self.plots_dir / f'distribution_{timestamp}.png'
-        plt.savefig(filepath, dpi=150, bbox_inches='tight')
-        plt.close()
+        fig.savefig(filepath, dpi=150, bbox_inches='tight')
         
         return filepath
     
-    def _plot_statistics(self, results):
+    def _plot_statistics(self, fig, results):
         """Create statistics summary visualization"""
-        fig, ax = plt.subplots(figsize=(10, 6))
+        fig.clear()
+        fig.set_size_inches(10, 6)
+        ax = fig.add_subplot()
         
         # Prepare data
         stats_labels = ['Mean', 'Median', 'Min', 'Max', 'Q25', 'Q75', 'Q90']
@@ -153,12 +173,11 @@ class DataVisualizer:
                 fontsize=9, verticalalignment='bottom', horizontalalignment='right',
                 bbox=dict(boxstyle='round', facecolor='lightblue', alpha=0.5))
         
-        plt.tight_layout()
+        fig.tight_layout()
         
         # Save
         timestamp = pd.Timestamp.now().strftime('%Y%m%d')
         filepath = self.plots_dir / f'statistics_{timestamp}.png'
-        plt.savefig(filepath, dpi=150, bbox_inches='tight')
-        plt.close()
+        fig.savefig(filepath, dpi=100, bbox_inches='tight')
         
         return filepath